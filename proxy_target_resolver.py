@@ -1,12 +1,120 @@
+import ipaddress
 import os
+import re
+import socket
+import struct
 import subprocess
+import sys
 import time
 import logging
+from concurrent.futures import ThreadPoolExecutor
 
 logging.basicConfig(level=logging.INFO)
 
 REVERSE_PROXY_TARGETS = dict()
 
+# Number of threads used to read configuration files concurrently.
+_READ_WORKERS = 8
+
+# Matches the Nginx directives we care about at the start of a line, stopping at comments.
+_DIRECTIVE_RE = re.compile(rb'(?m)^[ \t]*(proxy_pass|server_name)\b([^\n#]*)')
+
+# Apache configurations are scanned per <VirtualHost> block with comments removed upfront.
+_COMMENT_RE = re.compile(rb'#[^\n]*')
+_VIRTUAL_HOST_RE = re.compile(rb'<VirtualHost[^>]*>(.*?)</VirtualHost>', re.S)
+_APACHE_DIRECTIVE_RE = re.compile(rb'(?m)^[ \t]*(ProxyPass|ServerName|ServerAlias)\b([^\n]*)')
+
+# Matches a ProxyPass target URL or UNIX socket, quoted or not, with an
+# optional "|" separated second URL.
+_PROXY_URL = re.compile(r'"?(https?://[^"|\s]+|unix:[^"|\s]+)(?:\|([^"\s]+))?"?')
+
+# Parse results per (path, parser), stored with the (mtime, size) they were read at.
+_CONFIG_CACHE = {}
+
+# Kernel socket tables used to map targets to socket inodes.
+_PROC_NET_TCP = ("/proc/net/tcp", "/proc/net/tcp6")
+_PROC_NET_UNIX = "/proc/net/unix"
+
+# Local addresses of sockets listening on every interface.
+_WILDCARD_ADDRESSES = {"0.0.0.0", "::"}
+
+# Service name per (PID, start time), None when the process does not belong
+# to any unit. The start time keeps a reused PID from inheriting a service.
+_SYSTEMCTL_SERVICE_CACHE = {}
+
+# Characters used by systemctl status to draw the CGroup process tree.
+_CGROUP_TREE_CHARS = " │├└─|`-"
+
+
+def read_file(path):
+    """Read a whole file as bytes."""
+    # Unbuffered, so readall() sizes a single buffer from fstat and reads
+    # straight into it instead of going through a BufferedReader.
+    with open(path, "rb", buffering=0) as file:
+        return file.read()
+
+def read_config_files(config_dirs, parse):
+    """
+    Read and parse every configuration file in the given directories.
+
+    Files are read concurrently. A file whose modification time and size
+    are unchanged since the last call is not read again, its cached
+    parse result is reused instead.
+
+    Parameters
+    ----------
+    config_dirs : list of str
+        The directories to read, missing ones are skipped.
+    parse : callable
+        Parses the contents of a single file.
+
+    Returns
+    -------
+    list
+        The parse result of each file.
+    """
+    results = {}
+    stale = {}
+    for config_dir in config_dirs:
+        try:
+            entries = list(os.scandir(config_dir))
+        except FileNotFoundError:
+            continue
+
+        for entry in entries:
+            if not entry.is_file():
+                continue
+            st = entry.stat()
+            key = (st.st_mtime_ns, st.st_size)
+            cached = _CONFIG_CACHE.get((entry.path, parse))
+            if cached and cached[0] == key:
+                results[entry.path] = cached[1]
+            else:
+                stale[entry.path] = key
+                results[entry.path] = None
+
+    with ThreadPoolExecutor(max_workers=_READ_WORKERS) as executor:
+        for path, buf in zip(stale, executor.map(read_file, stale)):
+            results[path] = parse(buf)
+            _CONFIG_CACHE[(path, parse)] = (stale[path], results[path])
+
+    return list(results.values())
+
+def scan_directives(buf):
+    """
+    Scan configuration contents for directives in a single pass.
+
+    Parameters
+    ----------
+    buf : bytes
+        The contents of a configuration file.
+
+    Returns
+    -------
+    iterator of re.Match
+        A match per directive, with the directive name and its arguments as groups.
+    """
+    return _DIRECTIVE_RE.finditer(buf)
 
 def read_nginx_config():
     """
@@ -23,47 +131,44 @@ def read_nginx_config():
     domains = set()
     config_dirs = ["/etc/nginx/sites-enabled", "/etc/nginx/conf.d"]
 
-    for config_dir in config_dirs:
-        if os.path.exists(config_dir):
-            for filename in os.listdir(config_dir):
-                filepath = os.path.join(config_dir, filename)
-                with open(filepath, "r") as file:
-                    for line in file:
-                        # Extract reverse proxy targets using simple string check
-                        if 'proxy_pass' in line:
-                            parts = line.split()
-                            if len(parts) > 1 and parts[1].startswith('http'):
-                                targets.add(parts[1].strip(';'))
-
-                        # Extract server_name (domains) using string methods
-                        if 'server_name' in line:
-                            parts = line.split()
-                            if len(parts) > 1:
-                                domains.update(parts[1:])  # Domains can be space-separated
+    for file_targets, file_domains in read_config_files(config_dirs, parse_nginx_config):
+        targets.update(file_targets)
+        domains.update(file_domains)
 
     return targets, domains
 
-def reconstruct_line(line):
+def parse_nginx_config(buf):
     """
-    Splits the line into parts and reconstructs it by removing comments.
+    Extract the domains and reverse proxy targets of a single Nginx configuration file.
 
     Parameters
     ----------
-    line : str
-        The line to reconstruct.
+    buf : bytes
+        The contents of the configuration file.
 
     Returns
     -------
-    str
-        The reconstructed line without comments.
+    targets : set
+        The set of found targets.
+    domains : set
+        The set of found domains.
     """
-    parts = line.split()
-    reconstructed = []
-    for part in parts:
-        if part.startswith("#"):
-            break
-        reconstructed.append(part)
-    return " ".join(reconstructed)
+    targets = set()
+    domains = set()
+
+    for match in scan_directives(buf):
+        directive, value = match.groups()
+
+        if directive == b"proxy_pass":
+            parts = value.split()
+            if parts and parts[0].startswith((b"http://", b"https://")):
+                targets.add(sys.intern(parts[0].strip(b";").decode()))
+
+        elif directive == b"server_name":
+            # Domains can be space-separated
+            domains.update(map(sys.intern, value.replace(b";", b" ").decode().split()))
+
+    return targets, domains
 
 def proxypass_target(line):
     """
@@ -76,28 +181,12 @@ def proxypass_target(line):
 
     Returns
     -------
-    str or None
-        The extracted target URL or UNIX socket, or None if not found.
+    tuple
+        The extracted target URL or UNIX socket and the optional URL after
+        a "|", or (None, None) if not found.
     """
-    parts = line.split()
-    for part in parts:
-        # Handle if it contains a | character
-        if "|" in part:
-            part_1 = part.split("|")[0]
-            part_2 = part.split("|")[1]
-            
-            return part_1.strip('"'), part_2.strip('"')
-            
-
-        # Check if part is a URL
-        if part.startswith('"http'):
-            return part.strip('"'), None
-
-        # Check if part is a UNIX socket
-        if part.startswith('"unix:'):
-            return part.strip('"'), None
-
-    return None, None
+    match = _PROXY_URL.search(line)
+    return (match.group(1), match.group(2)) if match else (None, None)
 
 def read_apache_config():
     """Read apache2 configurations and extract all domains and reverse proxy targets."""
@@ -105,95 +194,277 @@ def read_apache_config():
     domains = set()
     config_dirs = ["/etc/apache2/sites-enabled", "/etc/apache2/conf-enabled"]
     infos = {}
-    for config_dir in config_dirs:
-        if os.path.exists(config_dir):
-            for filename in os.listdir(config_dir):
-                _info = {}
-                filepath = os.path.join(config_dir, filename)
-                with open(filepath, "r") as file:
-                    in_virtual_host = False
-                    for line in file:
-                        in_comment = False
-
-                        # Check if inside <VirtualHost> block
-                        if line.strip().startswith("<VirtualHost"):
-                            in_virtual_host = True
-                            
-                        if line.strip().startswith("#"):
-                            in_comment = True
-    
-                        if in_virtual_host and not in_comment:     
-                            line = reconstruct_line(line) # Remove comments
-                            # Extract reverse proxy targets
-                            if 'ProxyPass' in line:
-                                target = proxypass_target(line)
-                                _info["proxypass"] = target
-                                targets.add(target)
-                               
-                            
-                            # Extract ServerName and ServerAlias (domains)
-                            if 'ServerName' in line:
-                                parts = line.split()
-                                if len(parts) > 1:
-                                    name = parts[1].strip()
-                                    _info["name"] = name
-                                    domains.add(name)
-                            
-                            if 'ServerAlias' in line:
-                                parts = line.split()
-                                if len(parts) > 1:
-                                    _info["alias"] = parts[1:]
-                                    domains.update(parts[1:])  # Add all aliases
-
-                        # End of <VirtualHost> block
-                        if line.strip().startswith("</VirtualHost>"):
-                            in_virtual_host = False
-                            if "proxypass" in _info and _info["proxypass"]:
-                                infos[_info["proxypass"][0]] = _info
-                            
+    for file_targets, file_domains, file_infos in read_config_files(config_dirs, parse_apache_config):
+        targets.update(file_targets)
+        domains.update(file_domains)
+        infos.update(file_infos)
 
     return targets, domains, infos
 
-def check_port_usage(host, port):
-    """Check what is using a specific port."""
+def parse_apache_config(buf):
+    """
+    Extract the domains and reverse proxy targets of a single apache2 configuration file.
+
+    Parameters
+    ----------
+    buf : bytes
+        The contents of the configuration file.
+
+    Returns
+    -------
+    targets : set
+        The set of found targets.
+    domains : set
+        The set of found domains.
+    infos : dict
+        The ServerName, ServerAlias and ProxyPass of each VirtualHost, keyed by target.
+    """
+    targets = set()
+    domains = set()
+    infos = {}
+
+    # Most of conf-enabled has no VirtualHost at all, a plain substring
+    # search is enough to skip copying those files to strip comments.
+    if b"<VirtualHost" not in buf:
+        return targets, domains, infos
+
+    buf = _COMMENT_RE.sub(b"", buf)
+    for block in _VIRTUAL_HOST_RE.finditer(buf):
+        _info = {}
+        for match in _APACHE_DIRECTIVE_RE.finditer(buf, block.start(1), block.end(1)):
+            directive, value = match.groups()
+
+            # Extract reverse proxy targets
+            if directive == b"ProxyPass":
+                primary, failover = proxypass_target(value.decode())
+                if primary:
+                    target = (sys.intern(primary), failover and sys.intern(failover))
+                    _info["proxypass"] = target
+                    targets.add(target)
+
+            # Extract ServerName and ServerAlias (domains)
+            elif directive == b"ServerName":
+                parts = value.decode().split()
+                if parts:
+                    name = sys.intern(parts[0])
+                    _info["name"] = name
+                    domains.add(name)
+
+            elif directive == b"ServerAlias":
+                parts = [sys.intern(part) for part in value.decode().split()]
+                if parts:
+                    _info["alias"] = parts
+                    domains.update(parts)  # Add all aliases
+
+        if "proxypass" in _info:
+            infos[_info["proxypass"][0]] = _info
+
+    return targets, domains, infos
+
+def decode_socket_address(field):
+    """
+    Decode a hex encoded ``address:port`` field of /proc/net/tcp or /proc/net/tcp6.
+
+    Parameters
+    ----------
+    field : bytes
+        The field to decode, e.g. ``b"0100007F:1F90"``.
+
+    Returns
+    -------
+    tuple
+        The host and port as strings.
+    """
+    address, _, port = field.partition(b":")
+    # The address is stored as 32-bit words in host byte order.
+    words = [int(address[i:i + 8], 16) for i in range(0, len(address), 8)]
+    packed = struct.pack(f"={len(words)}I", *words)
+    family = socket.AF_INET if len(words) == 1 else socket.AF_INET6
+    host = socket.inet_ntop(family, packed).removeprefix("::ffff:")
+    return host, str(int(port, 16))
+
+def read_inet_sockets():
+    """
+    Read the TCP sockets of the system from /proc/net.
+
+    Returns
+    -------
+    dict
+        A dictionary mapping each socket inode to its local and remote
+        ``(host, port)`` endpoints.
+    """
+    sockets = {}
+    for table in _PROC_NET_TCP:
+        try:
+            buf = read_file(table)
+        except FileNotFoundError:
+            continue  # No IPv6 support
+
+        for line in buf.splitlines()[1:]:
+            fields = line.split()
+            inode = int(fields[9])
+            if inode:  # Sockets in TIME_WAIT have no inode
+                sockets[inode] = (decode_socket_address(fields[1]), decode_socket_address(fields[2]))
+    return sockets
+
+def read_unix_sockets(paths):
+    """
+    Read the UNIX sockets bound to the given paths from /proc/net/unix.
+
+    Parameters
+    ----------
+    paths : set of str
+        The socket paths to look for.
+
+    Returns
+    -------
+    dict
+        A dictionary mapping each socket inode to its path.
+    """
+    sockets = {}
+    for line in read_file(_PROC_NET_UNIX).splitlines()[1:]:
+        fields = line.split(None, 7)
+        if len(fields) == 8:
+            path = fields[7].decode(errors="replace")
+            if path in paths:
+                sockets[int(fields[6])] = path
+    return sockets
+
+def find_socket_owners(inodes):
+    """
+    Find the processes holding the given sockets by walking /proc/<pid>/fd once.
+
+    Parameters
+    ----------
+    inodes : collection of int
+        The socket inodes to look for.
+
+    Returns
+    -------
+    dict
+        A dictionary mapping each found inode to the list of PIDs holding it.
+    """
+    owners = {}
+    if not inodes:
+        return owners
+
+    denied = 0
+    with os.scandir("/proc") as procs:
+        for proc in procs:
+            if not proc.name.isdigit():
+                continue
+            links = []
+            try:
+                with os.scandir(os.path.join(proc.path, "fd")) as fds:
+                    for fd in fds:
+                        try:
+                            links.append(os.readlink(fd.path))
+                        except (FileNotFoundError, ProcessLookupError):
+                            continue  # The descriptor was closed meanwhile
+            except PermissionError:
+                denied += 1
+                continue
+            except (FileNotFoundError, ProcessLookupError):
+                continue  # The process exited
+
+            for link in links:
+                if not link.startswith("socket:["):
+                    continue
+                inode = int(link[8:-1])
+                if inode in inodes:
+                    pids = owners.setdefault(inode, [])
+                    if proc.name not in pids:
+                        pids.append(proc.name)
+
+    if denied:
+        message = "Could not read the open files of %d processes, their sockets are not reported."
+        if os.geteuid() != 0:
+            message += " Run the script as root."
+        logging.warning(message, denied)
+    return owners
+
+def resolve_host(host):
+    """
+    Resolve a target host to the set of addresses it may appear as in /proc/net.
+
+    Parameters
+    ----------
+    host : str
+        A hostname or IP address, IPv6 addresses may be in brackets.
+
+    Returns
+    -------
+    set of str
+        The addresses of the host, empty if it cannot be resolved, in which
+        case no socket is attributed to it.
+    """
+    host = host.strip("[]")
     try:
-        pids = subprocess.run(
-            ["sudo", "lsof", "-t", "-i", f"@{host}:{port}"],
-            stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE,
-            text=True
-        )
-        return pids.stdout.strip().split('\n')
-    except Exception as e:
-        return f"Error checking port {port} on {host}: {e}"
+        return {info[4][0] for info in socket.getaddrinfo(host, None, proto=socket.IPPROTO_TCP)}
+    except OSError as e:
+        logging.warning(f"Could not resolve host {host}: {e}")
+        return set()
 
-def check_unix_socket_usage(socket_path):
+def check_usage_batch(entries):
     """
-    Check what is using a specific UNIX socket.
+    Check what is using a batch of ports and UNIX sockets with a single pass over /proc.
 
     Parameters
     ----------
-    socket_path : str
-        The path to the UNIX socket.
+    entries : iterable
+        ``(host, port)`` tuples for network targets and paths for UNIX sockets.
 
     Returns
     -------
-    list of dict
-        A list of dictionaries containing details of each process using the socket.
+    dict
+        A dictionary mapping each entry to the list of PIDs using it.
     """
+    usage = {entry: [] for entry in entries}
+    if not usage:
+        return usage
+
+    by_port = {}
+    paths = set()
+    for entry in usage:
+        if isinstance(entry, tuple):
+            by_port.setdefault(entry[1], []).append(entry)
+        else:
+            paths.add(entry)
+    addresses = {entry: resolve_host(entry[0]) for entry in usage if isinstance(entry, tuple)}
+
     try:
-        pids = subprocess.run(
-            ["sudo", "lsof", "-t", socket_path],  # Use "-t" to get PIDs
-            stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE,
-            text=True
-        )
-        
-        return pids.stdout.strip().split('\n')
-        
+        # Map every socket inode to the entries it serves.
+        matches = {}
+        if by_port:
+            sockets = read_inet_sockets()
+
+            # A wildcard listener only serves targets that resolve to this host:
+            # loopback or an address some local socket is bound to.
+            local_hosts = {local[0] for local, _ in sockets.values()} - _WILDCARD_ADDRESSES
+            is_local = {
+                entry: any(host in local_hosts or ipaddress.ip_address(host).is_loopback for host in hosts)
+                for entry, hosts in addresses.items()
+            }
+
+            for inode, endpoints in sockets.items():
+                for host, port in endpoints:
+                    for entry in by_port.get(port, ()):
+                        if host in addresses[entry] or (host in _WILDCARD_ADDRESSES and is_local[entry]):
+                            matches.setdefault(inode, []).append(entry)
+        if paths:
+            for inode, path in read_unix_sockets(paths).items():
+                matches.setdefault(inode, []).append(path)
+
+        owners = find_socket_owners(matches.keys())
     except Exception as e:
-        logging.error(f"Error checking UNIX socket {socket_path}: {e}")
-        return []
+        logging.error(f"Error checking usage of {len(usage)} targets: {e}")
+        return usage
+
+    for inode, pids in owners.items():
+        for entry in matches[inode]:
+            usage[entry].extend(pid for pid in pids if pid not in usage[entry])
+
+    return usage
 
 def check_process_usage(process_name):
     """Check what is using a specific process name.
@@ -212,16 +483,17 @@ def check_process_usage(process_name):
         result = subprocess.run(
             ["pgrep", "-a", process_name],
             stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE,
-            text=True
+            stderr=subprocess.DEVNULL,
+            text=True,
+            close_fds=False  # Skip closing every fd up to RLIMIT_NOFILE
         )
         return result.stdout.strip()
     except Exception as e:
         return f"Error checking process {process_name}: {e}"
 
-def get_systemctl_service(pid):
+def process_start_time(pid):
     """
-    Identify the systemctl service associated with a process.
+    Read the start time of a process, which tells apart processes reusing a PID.
 
     Parameters
     ----------
@@ -230,48 +502,113 @@ def get_systemctl_service(pid):
 
     Returns
     -------
-    str
-        The parsed service name or an error message.
+    str or None
+        The start time in clock ticks since boot, or None if the process is gone.
     """
     try:
-        result = subprocess.run(
-            ["sudo", "systemctl", "status", f"{pid}"],
-            stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE,
-            text=True
-        )
-        result_ = result.stdout.strip()
-        return parse_systemctl_service_status(result_)[0]
-    except Exception as e:
-        return f"Error finding service: {e}"
+        stat = read_file(f"/proc/{pid}/stat")
+    except OSError:
+        return None
+    # The command name may contain spaces, fields are counted after its ")".
+    # starttime is field 22, the state after the ")" is field 3.
+    return stat.rpartition(b")")[2].split()[19].decode()
+
+def get_systemctl_services(pids):
+    """
+    Identify the systemctl services associated with a batch of processes.
 
-def parse_systemctl_service_status(status):
+    Lookups are memoized per PID and process start time, so only processes
+    that have not been seen before are passed to systemctl.
+
+    Parameters
+    ----------
+    pids : iterable of str
+        The process IDs.
+
+    Returns
+    -------
+    dict
+        A dictionary mapping each resolved process ID to its service name.
     """
-    Parse the output of systemctl status to extract the service name and status.
-    
+    keys = {pid: (pid, process_start_time(pid)) for pid in pids}
+    missing = [pid for pid, key in keys.items() if key[1] and key not in _SYSTEMCTL_SERVICE_CACHE]
+
+    if missing:
+        try:
+            # systemctl show interprets numbers as job IDs, only status accepts PIDs.
+            result = subprocess.run(
+                ["systemctl", "status", "--no-pager", "--lines=0", "--", *missing],
+                stdout=subprocess.PIPE,
+                stderr=subprocess.DEVNULL,
+                text=True,
+                close_fds=False
+            )
+            found = parse_systemctl_status(result.stdout, missing)
+            for pid in missing:
+                _SYSTEMCTL_SERVICE_CACHE[keys[pid]] = found.get(pid)
+        except Exception as e:
+            logging.error(f"Error finding services: {e}")
+
+    return {
+        pid: _SYSTEMCTL_SERVICE_CACHE[key]
+        for pid, key in keys.items()
+        if _SYSTEMCTL_SERVICE_CACHE.get(key)
+    }
+
+def parse_systemctl_status(status, pids):
+    """
+    Parse the output of systemctl status to map process IDs to service names.
+
     Parameters
     ----------
     status : str
-        The output of the systemctl status command.
-    
+        The output of the systemctl status command for one or more units.
+    pids : iterable of str
+        The process IDs to look for.
+
     Returns
     -------
-    tuple
-        A tuple containing the service name and status.
+    dict
+        A dictionary mapping each found process ID to its service name.
     """
-    lines = status.split("\n")
-    service_name = lines[0].split(" ")[1]
-    service_status = lines[2].split(":")[1].strip() if len(lines) > 2 and ":" in lines[2] else "unknown"
-    return service_name, service_status
+    wanted = set(pids)
+    services = {}
+    service_name = None
+
+    for line in status.split("\n"):
+        stripped = line.strip()
+        if not stripped:
+            continue
+
+        # Every unit starts with an unindented header, e.g. "● nginx.service - ..."
+        if not line[0].isspace():
+            parts = line.split()
+            service_name = parts[1] if len(parts) > 1 else None
+            continue
+
+        if stripped.startswith("Main PID:"):
+            pid = stripped.split()[2]
+        elif stripped[0] in _CGROUP_TREE_CHARS:
+            pid = stripped.lstrip(_CGROUP_TREE_CHARS).partition(" ")[0]
+        else:
+            continue
+
+        if service_name and pid in wanted:
+            services.setdefault(pid, service_name)
+
+    return services
 
 def resolve_targets(targets):
     """
-    Recursively analyze services running behind reverse proxies.
+    Analyze the services running behind reverse proxies.
+
+    Only the given targets are checked, the sockets a backend itself
+    connects to are not followed.
     
     Parameters
     ----------
-    targets : set
-        A set of target endpoints to resolve.
+    targets : iterable
+        The target endpoints to resolve.
     
     Returns
     -------
@@ -280,63 +617,49 @@ def resolve_targets(targets):
     """
     visited = set()
     details = {}
-    processed_pids = set()
+    logging.debug("Resolving targets: %s", targets)
 
-    while targets:
-        logging.debug("Resolving targets: %s", targets)
-        target = targets.pop()
-        primary, failover = target
+    # Collect every target so all of them are checked in a single pass over /proc.
+    batch = {}
+    for target in targets:
+        primary, failover = target if isinstance(target, tuple) else (target, None)
+        if not primary or primary in visited:
+            continue
 
-        if primary and failover:
+        if failover:
             logging.warning("Failover target detected: %s", failover)
-            visited.add(primary)
-            target = primary
-        else:
-            target = primary
+        target = primary
         logging.debug("Resolving target: %s", target)
         visited.add(target)
 
         if target.startswith("unix:"):
             logging.debug("UNIX socket detected: %s", target)
-            socket_path = target[5:]
-            usage_info = check_unix_socket_usage(socket_path)
+            batch[target] = target[5:]
         else:
-            if target.startswith("http://"):
-                target = target[7:]
-            host, port = target.split(":") if ":" in target else (target, "80")
-            usage_info = check_port_usage(host, port)
-
-        systemctl_services = set()
-        if isinstance(usage_info, list):
-            for entry in usage_info:
-                pid = entry
-                
-                if pid and isinstance(pid, str) and pid not in processed_pids:
-                    service = get_systemctl_service(pid)
-                    systemctl_services.add(service)
-                    processed_pids.add(pid)
-        else:
-            logging.error("Unexpected usage_info format for target %s", target)
+            default_port = "443" if target.startswith("https://") else "80"
+            scheme_end = target.find("://")
+            if scheme_end >= 0:
+                target = target[scheme_end + 3:]
+            address = target.partition("/")[0]
+            host, sep, port = address.rpartition(":")
+            if not sep or "]" in port:  # No port, e.g. a bracketed IPv6 host like [::1]
+                host, port = address, default_port
+            batch[target] = (host, port)
+
+    usage = check_usage_batch(set(batch.values()))
+
+    # Every PID of every target is resolved with a single systemctl call.
+    services = get_systemctl_services(pid for pids in usage.values() for pid in pids)
+
+    for target, entry in batch.items():
+        usage_info = usage.get(entry, [])
+        systemctl_services = {services[pid] for pid in usage_info if pid in services}
 
         details[target] = {
             "usage_info": usage_info,
             "systemctl_service": list(systemctl_services)
         }
 
-        # Identify new targets from the processes
-        if isinstance(usage_info, list):
-            new_ports = [entry['name'].split(":")[1] for entry in usage_info if 'name' in entry and entry['name'].startswith("127.0.0.1:")]
-            for new_port in new_ports:
-                new_target = f"127.0.0.1:{new_port}"
-                if new_target not in visited:
-                    targets.add(new_target)
-
-            new_sockets = [entry['name'][5:] for entry in usage_info if 'name' in entry and entry['name'].startswith("unix:")]
-            for new_socket in new_sockets:
-                new_target = f"unix:{new_socket}"
-                if new_target not in visited:
-                    targets.add(new_target)
-
     return details
 
 def main():
@@ -359,7 +682,14 @@ def main():
     if not all_targets and not all_domains:
         logging.info("No reverse proxy targets or domains found.")
         return
-    
+
+    # Index the VirtualHost domains by target, keyed like resolve_targets
+    # keys its results: without the URL scheme.
+    domain_index = {
+        target.partition("://")[2] or target: (info.get("name"), tuple(info.get("alias", ())))
+        for target, info in infos.items()
+    }
+
     print("Resolving targets...")
     resolved = resolve_targets(all_targets)
 
@@ -368,16 +698,8 @@ def main():
         print(f"PIDs: {info['usage_info']}")
         print(f"Systemctl Service: {info['systemctl_service']}")
         # Print associated domains
-        is_http = target.endswith("/")
-        target = "http://" + target if is_http else target
-#        if is_http:
-        associated_domains = []
-        if target in infos:
-            if "alias" in infos[target]:
-                associated_domains = infos[target]["alias"]
-            associated_domains.append(infos[target]["name"])
-           
-            
+        name, aliases = domain_index.get(target, (None, ()))
+        associated_domains = [*aliases, name] if name else list(aliases)
         print(f"Associated Domains: {associated_domains}")
         print()
 